@@ -10,21 +10,123 @@ Usage (from project root):
     python3 scripts/test_mcp.py --test tools
     python3 scripts/test_mcp.py --test cap
     python3 scripts/test_mcp.py --test click --app Messages --search "Krishna"
+
+Keeping one server alive across runs (skips server startup on every run):
+    python3 scripts/test_mcp.py --daemon          # in another terminal
+    python3 scripts/test_mcp.py --reuse --test click
 """
 
 import json
+import mmap
 import os
+import select
+import selectors
+import socket
 import subprocess
 import sys
-import threading
-import argparse
-import queue
+import time
+import types
 import re
+from collections import OrderedDict, deque
+from itertools import islice
+from operator import itemgetter
 from typing import Any, Optional
 
+# orjson is optional: it encodes straight to bytes and decodes bytes without a
+# utf-8 decode step. Fall back to the stdlib so the script runs anywhere.
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+    # orjson parses a memoryview in place; json.loads only takes bytes/bytearray
+    _LOADS_MEMORYVIEW = True
+except ImportError:
+    # One shared compact encoder (json.dumps with custom separators would build a
+    # new JSONEncoder per call). ensure_ascii output is pure ASCII, so the encode
+    # to bytes is a straight copy.
+    _encode = json.JSONEncoder(separators=(",", ":")).encode
+
+    def _dumps(obj: Any) -> bytes:
+        return _encode(obj).encode("ascii")
+    _loads = json.loads
+    _LOADS_MEMORYVIEW = False
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SERVER_BIN = os.path.join(PROJECT_ROOT, ".build", "debug", "mcp-server-macos-use")
 
+# A line holding nothing but whitespace (matched in place with pos/endpos)
+_BLANK_LINE_RE = re.compile(rb"\s*")
+
+# Constant head of every tools/call request; the id, name and arguments follow.
+_TOOLS_CALL_PREFIX = b'{"jsonrpc":"2.0","method":"tools/call","id":'
+
+# Pipe buffer / read chunk size. Traversal responses can be hundreds of KB, so
+# read them in large chunks rather than a few KB (or a byte) per syscall.
+PIPE_BUFSIZE = 64 * 1024
+# Kernel pipe capacity to request, so the server can write a whole traversal
+# response without stalling until the client reads.
+PIPE_SIZE = 1 << 20
+
+# Roles a test may click on. Elements report "AXRole (description)", so match on
+# the part before the first space.
+CLICKABLE_ROLES = frozenset({
+    "AXButton", "AXMenuButton", "AXPopUpButton", "AXRadioButton", "AXCheckBox", "AXStaticText",
+})
+
+# Server stderr lines kept for dump_stderr()
+STDERR_KEEP_LINES = 200
+
+# Print the [client] request/response trace lines; set from --verbose
+VERBOSE = False
+
+# Unix socket used by --daemon / --reuse
+SOCKET_PATH = "/tmp/mcp-macos-use.sock"
+
+# Tools the server must advertise in tools/list
+EXPECTED_TOOLS = frozenset({
+    "macos-use_open_application_and_traverse",
+    "macos-use_click_and_traverse",
+    "macos-use_type_and_traverse",
+    "macos-use_press_key_and_traverse",
+    "macos-use_scroll_and_traverse",
+    "macos-use_refresh_traversal",
+})
+
+# Read-only tools whose results may be reused within one run. Entries expire after
+# CALL_CACHE_TTL seconds (UI state drifts) and any other tool call clears the cache.
+CACHEABLE_TOOLS = frozenset({"macos-use_refresh_traversal"})
+CALL_CACHE_TTL = 2.0
+CALL_CACHE_SIZE = 16
+
+
+def _spawn_server(binary: str, stderr: Optional[int]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [binary],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=stderr,
+        bufsize=PIPE_BUFSIZE,
+        # Python fds are non-inheritable by default (PEP 446), so skip the
+        # child-side close() sweep over every possible fd.
+        close_fds=False,
+        # Own session: a Ctrl-C in the terminal reaches only this script, which
+        # then shuts the server down cleanly via close().
+        start_new_session=True,
+    )
+    # Resized after the spawn rather than via Popen(pipesize=), which raises when
+    # fs.pipe-max-size is below PIPE_SIZE; the default capacity is fine then.
+    # Pipes can't be resized outside Linux (e.g. macOS).
+    if sys.platform == "linux":
+        import fcntl
+        F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            if pipe is not None:
+                try:
+                    fcntl.fcntl(pipe.fileno(), F_SETPIPE_SZ, PIPE_SIZE)
+                except OSError:
+                    pass
+    return proc
+
 
 # ---------------------------------------------------------------------------
 # Low-level MCP client (binary, newline-delimited JSON-RPC over stdio)
@@ -32,131 +134,412 @@ SERVER_BIN = os.path.join(PROJECT_ROOT, ".build", "debug", "mcp-server-macos-use
 
 class MCPClient:
     def __init__(self, binary: str, timeout: float = 30.0):
-        print(f"[client] Spawning server: {binary}", flush=True)
+        if VERBOSE:
+            print(f"[client] Spawning server: {binary}")
         if not os.path.exists(binary):
             raise FileNotFoundError(f"Server binary not found: {binary}")
+        self.proc = _spawn_server(binary, stderr=subprocess.PIPE)
+        assert self.proc.stdin is not None
+        self._stdin_fd = self.proc.stdin.fileno()
+        self._init_state(self.proc.stdout, timeout)
+        # stderr is drained by the same selector loop that waits for responses —
+        # no background thread, no per-line thread hop.
+        assert self.proc.stderr is not None
+        self._errfd = self.proc.stderr.fileno()
+        self._err_buf = bytearray()
+        self._sel.register(self.proc.stderr, selectors.EVENT_READ, "stderr")
+        if VERBOSE:
+            print(f"[client] Server PID: {self.proc.pid}")
+
+    def _init_state(self, stream, timeout: float):
         self.timeout = timeout
-        self.proc = subprocess.Popen(
-            [binary],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
         self._id = 0
-        self._stderr_lines: list[str] = []
-        threading.Thread(target=self._drain_stderr, daemon=True).start()
-        print(f"[client] Server PID: {self.proc.pid}", flush=True)
-
-    def _drain_stderr(self):
-        assert self.proc.stderr is not None
-        for line in self.proc.stderr:
-            decoded = line.decode("utf-8", errors="replace").rstrip()
-            self._stderr_lines.append(decoded)
+        # Responses are read straight off the stdout fd; the selector provides the
+        # timeout and _buf holds any bytes received past the last complete line.
+        # Every complete line in a chunk is decoded at once into _inbox, so a read
+        # that carries several messages is split and parsed in a single pass.
+        self._sel = selectors.DefaultSelector()
+        self._rfd = stream.fileno()
+        self._sel.register(stream, selectors.EVENT_READ)
+        self._buf = bytearray()
+        self._chunk = bytearray(PIPE_BUFSIZE)
+        self._chunk_view = memoryview(self._chunk)
+        self._scanned = 0
+        self._inbox: deque[dict] = deque()
+        self._call_cache: OrderedDict[tuple, tuple[float, "ToolResult"]] = OrderedDict()
+        # Only the tail is ever shown (dump_stderr), so keep a bounded ring buffer
+        self._stderr_lines: deque[str] = deque(maxlen=STDERR_KEEP_LINES)
+        self._errfd: Optional[int] = None
+
+    def _read_stderr(self):
+        """Read one chunk of server stderr into _stderr_lines (fd must be readable)."""
+        chunk = os.read(self._errfd, PIPE_BUFSIZE)
+        if not chunk:
+            self._sel.unregister(self.proc.stderr)
+            self._errfd = None
+            chunk = b"\n"  # flush a trailing partial line
+        self._err_buf += chunk
+        *lines, rest = self._err_buf.split(b"\n")
+        self._err_buf = bytearray(rest)
+        self._stderr_lines.extend(line.decode("utf-8", errors="replace").rstrip() for line in lines if line)
+
+    def _pump_stderr(self, timeout: float = 0.0):
+        """Drain server stderr outside _read_response, until EOF or `timeout`s have passed
+        in total (with the default 0, until nothing more is immediately available)."""
+        deadline = time.monotonic() + timeout
+        while self._errfd is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._errfd], [], [], remaining)
+            if not readable:
+                return
+            self._read_stderr()
+
+    def _write(self, chunks: list[bytes]):
+        """Write chunks to the server's stdin fd with writev — one gather syscall,
+        no join and no trip through the BufferedWriter."""
+        while chunks:
+            written = os.writev(self._stdin_fd, chunks)
+            # Pipes can accept a partial write; drop what went out and retry the rest.
+            while chunks and written >= len(chunks[0]):
+                written -= len(chunks.pop(0))
+            if written:
+                chunks[0] = chunks[0][written:]
 
     def _next_id(self) -> int:
         self._id += 1
         return self._id
 
-    def send(self, method: str, params: Optional[dict] = None, notify: bool = False) -> Optional[dict]:
+    def _message(self, method: str, params: Optional[dict] = None, notify: bool = False) -> dict:
         msg: dict[str, Any] = {"jsonrpc": "2.0", "method": method}
         if not notify:
             msg["id"] = self._next_id()
         if params is not None:
             msg["params"] = params
+        return msg
 
-        data = (json.dumps(msg) + "\n").encode("utf-8")
-        assert self.proc.stdin is not None
-        self.proc.stdin.write(data)
-        self.proc.stdin.flush()
-
-        if notify:
-            return None
-
-        return self._read_response()
+    def send(self, method: str, params: Optional[dict] = None, notify: bool = False) -> Optional[dict]:
+        rid = self.send_no_wait(method, params, notify)
+        return None if rid is None else self.wait_response(rid)
+
+    def send_no_wait(self, method: str, params: Optional[dict] = None, notify: bool = False) -> Optional[int]:
+        """Write one message and return its id (None for notifications) without waiting.
+        Collect the response later with wait_response(id)."""
+        msg = self._message(method, params, notify)
+        self._write([_dumps(msg), b"\n"])
+        return msg.get("id")
+
+    def _send_tool_call(self, name: str, arguments: dict) -> int:
+        """Write a tools/call request and return its id. The fixed envelope is a
+        prebuilt bytes template, so only the name and arguments are serialized;
+        writev gathers the pieces without concatenating them."""
+        rid = self._next_id()
+        self._write([
+            _TOOLS_CALL_PREFIX, str(rid).encode(),
+            b',"params":{"name":', _dumps(name),
+            b',"arguments":', _dumps(arguments), b"}}\n",
+        ])
+        return rid
+
+    def wait_response(self, rid: int) -> dict:
+        """Return the response to request `rid`, reading until it arrives.
+        Only one request is outstanding at a time, so anything else read on the way
+        (server notifications, late answers to a request that timed out) is skipped."""
+        while True:
+            resp = self._read_response()
+            if resp.get("id") == rid:
+                return resp
 
     def _read_response(self) -> dict:
-        assert self.proc.stdout is not None
-        result_q: queue.Queue = queue.Queue()
-
-        def reader():
-            try:
-                while True:
-                    line = self.proc.stdout.readline()
-                    if not line:
-                        result_q.put(RuntimeError("Server closed stdout"))
-                        return
-                    line = line.strip()
-                    if line:
-                        result_q.put(json.loads(line.decode("utf-8")))
-                        return
-            except Exception as e:
-                result_q.put(e)
-
-        t = threading.Thread(target=reader, daemon=True)
-        t.start()
+        deadline = time.monotonic() + self.timeout
+        while not self._inbox:
+            remaining = deadline - time.monotonic()
+            events = self._sel.select(remaining) if remaining > 0 else []
+            if not events:
+                raise TimeoutError(f"No response from server after {self.timeout}s")
+            for key, _ in events:
+                if key.data == "stderr":
+                    self._read_stderr()
+                    continue
+                # readv into a reusable scratch buffer: no new bytes object per read
+                n = os.readv(self._rfd, [self._chunk])
+                if not n:
+                    raise RuntimeError("Server closed stdout")
+                self._buf += self._chunk_view[:n]
+                self._decode_lines()
+        return self._inbox.popleft()
+
+    def _decode_lines(self):
+        """Move every complete line in _buf into _inbox, keeping the trailing partial line.
+        A line that fails to parse is dropped after the rest are queued, then its error
+        is raised — the consumed bytes are always trimmed, so nothing is queued twice."""
+        buf = self._buf
+        # With orjson each line is parsed straight out of _buf through a memoryview
+        # slice; the stdlib path slices (copies) it into a bytearray instead.
+        view = memoryview(buf) if _LOADS_MEMORYVIEW else buf
+        start = 0
+        error: Optional[ValueError] = None
         try:
-            result = result_q.get(timeout=self.timeout)
-        except queue.Empty:
-            raise TimeoutError(f"No response from server after {self.timeout}s")
-        if isinstance(result, Exception):
-            raise result
-        return result
+            # Bytes before _scanned were already searched for a newline on an earlier
+            # chunk — a multi-MB response arriving in 64 KiB pieces is scanned once, not O(n²).
+            nl = buf.find(b"\n", self._scanned)
+            while nl >= 0:
+                line_start, start = start, nl + 1
+                if not _BLANK_LINE_RE.fullmatch(buf, line_start, nl):
+                    try:
+                        self._inbox.append(_loads(view[line_start:nl]))
+                    except ValueError as e:  # JSONDecodeError from either decoder
+                        error = error or e
+                nl = buf.find(b"\n", start)
+        finally:
+            # _buf can't be resized while a view on it is exported
+            if view is not buf:
+                view.release()
+            if start:
+                del buf[:start]
+            self._scanned = len(buf)
+        if error is not None:
+            raise error
 
     def initialize(self) -> dict:
-        print("[client] → initialize", flush=True)
+        # MCP lifecycle: nothing else may be sent until the initialize result is in,
+        # and notifications/initialized only follows a successful initialize.
+        if VERBOSE:
+            print("[client] → initialize")
         resp = self.send("initialize", {
             "protocolVersion": "2024-11-05",
             "capabilities": {},
             "clientInfo": {"name": "test-client", "version": "1.0"},
         })
-        print("[client] ← initialize OK", flush=True)
-        self.send("notifications/initialized", notify=True)
+        if "result" not in resp:
+            return resp
+        if VERBOSE:
+            print("[client] ← initialize OK")
+        self.send_no_wait("notifications/initialized", notify=True)
         return resp
 
     def list_tools(self) -> list:
-        print("[client] → tools/list", flush=True)
+        if VERBOSE:
+            print("[client] → tools/list")
         resp = self.send("tools/list", {})
         tools = resp.get("result", {}).get("tools", [])
-        print(f"[client] ← tools/list: {len(tools)} tools", flush=True)
+        if VERBOSE:
+            print(f"[client] ← tools/list: {len(tools)} tools")
         return tools
 
     def call_tool(self, name: str, arguments: dict) -> "ToolResult":
-        print(f"[client] → tools/call {name} {arguments}", flush=True)
-        resp = self.send("tools/call", {"name": name, "arguments": arguments})
+        key = None
+        if name in CACHEABLE_TOOLS:
+            key = (name, json.dumps(arguments, sort_keys=True))
+            hit = self._call_cache.get(key)
+            if hit and time.monotonic() - hit[0] < CALL_CACHE_TTL:
+                self._call_cache.move_to_end(key)
+                if VERBOSE:
+                    print(f"[client] ↺ tools/call {name} {arguments} (cached)")
+                return hit[1]
+        else:
+            # Anything else may change UI state — earlier traversals are stale.
+            self._call_cache.clear()
+
+        if VERBOSE:
+            print(f"[client] → tools/call {name} {arguments}")
+        resp = self.wait_response(self._send_tool_call(name, arguments))
         result = resp.get("result", {})
         content = result.get("content", [])
         text = content[0].get("text", "") if content else ""
-        print(f"[client] ← tools/call {name} done", flush=True)
-        return ToolResult(text)
+        if VERBOSE:
+            print(f"[client] ← tools/call {name} done")
+        tool_result = ToolResult(text)
+        if key is not None and tool_result.status == "success":
+            self._call_cache[key] = (time.monotonic(), tool_result)
+            if len(self._call_cache) > CALL_CACHE_SIZE:
+                self._call_cache.popitem(last=False)
+        return tool_result
 
     def close(self):
         try:
             if self.proc.stdin:
                 self.proc.stdin.close()
-            self.proc.wait(timeout=5)
+            # Keep draining stderr so the server can't block on a full pipe while
+            # exiting; draining and waiting share one 5s budget before the kill.
+            deadline = time.monotonic() + 5
+            self._pump_stderr(timeout=5)
+            self.proc.wait(timeout=max(0.0, deadline - time.monotonic()))
         except Exception:
             self.proc.kill()
+        finally:
+            self._sel.close()
 
     def dump_stderr(self, n: int = 30):
-        if self._stderr_lines:
+        self._pump_stderr()
+        lines = self._stderr_lines
+        if lines:
             print(f"\n[server stderr (last {n} lines)]:")
-            for line in self._stderr_lines[-n:]:
+            # Walk only the tail of the ring buffer instead of copying all of it
+            for line in islice(lines, max(0, len(lines) - n), None):
                 print(f"  {line}")
 
 
+class MCPSocketClient(MCPClient):
+    """MCPClient talking to a server kept alive by `--daemon` over a Unix socket."""
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = 30.0):
+        if VERBOSE:
+            print(f"[client] Connecting to daemon: {path}")
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self._init_state(self.sock, timeout)
+
+    def _write(self, chunks: list[bytes]):
+        self.sock.sendall(b"".join(chunks))
+
+    def close(self):
+        self._sel.close()
+        self.sock.close()
+
+
+def serve_daemon(binary: str, path: str = SOCKET_PATH):
+    """Run the server once and relay it to one `--reuse` client at a time over a Unix socket.
+
+    An MCP session is initialized once per server process, so the first initialize
+    result is remembered and replayed to later clients; their initialize and
+    notifications/initialized messages are answered here and never forwarded.
+    """
+    if not os.path.exists(binary):
+        raise FileNotFoundError(f"Server binary not found: {binary}")
+    server = _spawn_server(binary, stderr=None)
+    assert server.stdin is not None and server.stdout is not None
+    print(f"[daemon] Server PID: {server.pid}", flush=True)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    print(f"[daemon] Listening on {path} (Ctrl-C to stop)", flush=True)
+
+    init_result: Optional[dict] = None
+    init_id = None  # daemon id of the forwarded initialize whose result we still need to capture
+    server_initialized = False  # the first notifications/initialized has been forwarded
+    # Every client numbers its requests from 1, so requests are renumbered on the
+    # way in and answers mapped back on the way out. Answers to ids not in
+    # `pending` belong to a client that already disconnected and are dropped.
+    next_id = 0
+    pending: dict[int, Any] = {}
+    from_server = bytearray()
+    sel = selectors.DefaultSelector()
+    sel.register(server.stdout, selectors.EVENT_READ)
+    try:
+        while server.poll() is None:
+            conn, _ = listener.accept()
+            print("[daemon] Client connected", flush=True)
+            sel.register(conn, selectors.EVENT_READ)
+            from_client = bytearray()
+            connected = True
+            while connected and server.poll() is None:
+                for key, _ in sel.select():
+                    reply = []
+                    if key.fileobj is conn:
+                        try:
+                            chunk = conn.recv(PIPE_BUFSIZE)
+                        except OSError:
+                            chunk = b""
+                        if not chunk:
+                            connected = False
+                            break
+                        from_client += chunk
+                        *lines, rest = from_client.split(b"\n")
+                        from_client = bytearray(rest)
+                        forward = []
+                        for line in lines:
+                            if not line.strip():
+                                continue
+                            msg = _loads(line)
+                            method = msg.get("method")
+                            if init_result is not None and method == "initialize":
+                                reply.append(_dumps({"jsonrpc": "2.0", "id": msg.get("id"), "result": init_result}) + b"\n")
+                            elif method == "notifications/initialized" and server_initialized:
+                                pass
+                            else:
+                                if method == "notifications/initialized":
+                                    server_initialized = True
+                                if method is not None and "id" in msg:
+                                    next_id += 1
+                                    pending[next_id] = msg["id"]
+                                    msg["id"] = next_id
+                                    if method == "initialize":
+                                        init_id = next_id
+                                forward.append(_dumps(msg) + b"\n")
+                        if forward:
+                            server.stdin.write(b"".join(forward))
+                            server.stdin.flush()
+                    else:
+                        chunk = os.read(server.stdout.fileno(), PIPE_BUFSIZE)
+                        if not chunk:
+                            connected = False
+                            break
+                        from_server += chunk
+                        *lines, rest = from_server.split(b"\n")
+                        from_server = bytearray(rest)
+                        for line in lines:
+                            if not line.strip():
+                                continue
+                            msg = _loads(line)
+                            rid = msg.get("id")
+                            if rid is None or "method" in msg:
+                                # Notifications and server-initiated requests pass through
+                                reply.append(bytes(line) + b"\n")
+                                continue
+                            if rid == init_id and "result" in msg:
+                                init_result = msg["result"]
+                                init_id = None
+                            if rid in pending:
+                                msg["id"] = pending.pop(rid)
+                                reply.append(_dumps(msg) + b"\n")
+                    if reply:
+                        try:
+                            conn.sendall(b"".join(reply))
+                        except OSError:
+                            connected = False
+                            break
+            sel.unregister(conn)
+            conn.close()
+            pending.clear()
+            print("[daemon] Client disconnected", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sel.close()
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        server.stdin.close()
+        try:
+            server.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        print("[daemon] Stopped", flush=True)
+
+
 # ---------------------------------------------------------------------------
 # Tool result parser — handles the compact summary format
 # ---------------------------------------------------------------------------
 
+# "key: value" summary lines; indented lines (element lists, text changes) are not fields.
+_FIELD_RE = re.compile(r"^(?!  )(.*?): (.*)$", re.MULTILINE)
+# One element line of the flat text response file: [Role] "text" x:N y:N w:N h:N visible
+# Diff lines carry a "+ ", "- " or "~ " prefix; plain traversal lines are space-indented.
+_ELEMENT_LINE_RE = re.compile(rb'^([+~-] | *)\[([^\]\n]+)\](?:[^\S\n]+"([^"\n]*)")?(.*)$', re.MULTILINE)
+_COORD_RE = re.compile(rb"(x|y|w|h):(-?\d+)")
+_COORD_KEYS = {b"x": "x", b"y": "y", b"w": "width", b"h": "height"}
+
+
 class ToolResult:
     """Parses the compact text summary returned by MCP tools."""
     def __init__(self, text: str):
         self.raw = text
-        self._fields = {}
-        for line in text.split("\n"):
-            if ": " in line and not line.startswith("  "):
-                key, _, val = line.partition(": ")
-                self._fields[key.strip()] = val.strip()
+        self._json_cache: Optional[dict] = None
+        self._interactables: Optional[list] = None
+        self._viewport_mask: Optional[bytearray] = None
+        self._fields = {m.group(1).strip(): m.group(2).strip() for m in _FIELD_RE.finditer(text)}
 
     @property
     def status(self) -> str:
@@ -183,66 +566,106 @@ class ToolResult:
     def error(self) -> Optional[str]:
         return self._fields.get("error") or self._fields.get("traversal_error")
 
+    def _iter_elements(self):
+        """Stream the flat text response file, yielding (prefix, element) per element line.
+        prefix is "+", "-", "~" for diff lines and "" for plain traversal lines.
+        The file is mmapped and scanned with one precompiled regex, so line splitting,
+        decoding and prefix detection all happen in C over the page-cache mapping.
+        """
+        if not self.file or not os.path.exists(self.file):
+            return
+        with open(self.file, "rb") as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                return
+            # Roles are a small vocabulary: decode each distinct one once, so every
+            # element shares the same str object (and its cached hash)
+            role_names: dict[bytes, str] = {}
+            with mm:
+                for m in _ELEMENT_LINE_RE.finditer(mm):
+                    prefix, role, text, rest = m.groups()
+                    name = role_names.get(role)
+                    if name is None:
+                        name = role_names[role] = role.decode("utf-8", errors="replace")
+                    el = {"role": name,
+                          "text": text.decode("utf-8", errors="replace") if text else ""}
+                    for kv in _COORD_RE.finditer(rest):
+                        el[_COORD_KEYS[kv.group(1)]] = int(kv.group(2))
+                    el["in_viewport"] = b"visible" in rest
+                    yield prefix.strip().decode(), el
+
     def load_full_text(self) -> list:
         """Load the flat text response file and parse element lines into dicts.
         Returns a list of element dicts with keys: role, text, x, y, width, height, in_viewport, prefix.
         """
-        if not self.file or not os.path.exists(self.file):
-            return []
-        import re
         elements = []
-        with open(self.file, "r") as f:
-            for line in f:
-                line = line.rstrip("\n")
-                if not line or line.startswith("#"):
-                    continue
-                # Detect prefix: "+ ", "- ", "~ ", or " " (plain element)
-                prefix = ""
-                content = line
-                if line.startswith("+ ") or line.startswith("- ") or line.startswith("~ "):
-                    prefix = line[0]
-                    content = line[2:]
-                elif line.startswith(" "):
-                    content = line.lstrip(" ")
-
-                # Parse: [Role] "text" x:N y:N w:N h:N visible
-                m = re.match(r'\[([^\]]+)\](?:\s+"([^"]*)")?(.*)$', content)
-                if not m:
-                    continue
-                role = m.group(1)
-                text = m.group(2) or ""
-                rest = m.group(3)
-
-                el = {"role": role, "text": text, "prefix": prefix}
-                for kv in re.finditer(r'(x|y|w|h):(-?\d+)', rest):
-                    key = kv.group(1)
-                    val = int(kv.group(2))
-                    if key == "w":
-                        el["width"] = val
-                    elif key == "h":
-                        el["height"] = val
-                    else:
-                        el[key] = val
-                el["in_viewport"] = "visible" in rest
-                elements.append(el)
+        for prefix, el in self._iter_elements():
+            el["prefix"] = prefix
+            elements.append(el)
         return elements
 
     def load_full_json(self) -> dict:
-        """Compatibility shim: load flat text and wrap in the old JSON structure."""
-        elements = self.load_full_text()
-        if not elements:
-            return {}
+        """Compatibility shim: load flat text and wrap in the old JSON structure.
+        The result is cached on the instance — callers must not mutate it.
+        """
+        if self._json_cache is None:
+            self._json_cache = self._build_full_json()
+        return self._json_cache
+
+    def _build_full_json(self) -> dict:
+        # Single streaming pass: bucket each element as it is parsed instead of
+        # materializing the whole file and re-scanning / copying it per bucket.
+        buckets: dict[str, list] = {"": [], "+": [], "-": [], "~": []}
+        for prefix, el in self._iter_elements():
+            if prefix:
+                el["prefix"] = prefix
+            buckets[prefix].append(el)
+        added, removed, modified = buckets["+"], buckets["-"], buckets["~"]
         # Check if it's a diff (has prefixed elements) or full traversal
-        has_diff = any(e.get("prefix") in ("+", "-", "~") for e in elements)
-        if has_diff:
-            added = [e for e in elements if e.get("prefix") == "+"]
-            removed = [e for e in elements if e.get("prefix") == "-"]
-            modified = [e for e in elements if e.get("prefix") == "~"]
+        if added or removed or modified:
             return {"diff": {"added": added, "removed": removed, "modified": modified}}
-        else:
-            # Strip prefix key for clean elements
-            clean = [{k: v for k, v in e.items() if k != "prefix"} for e in elements]
-            return {"traversal": {"elements": clean, "stats": {"truncated": len(clean) >= 2000}}}
+        clean = buckets[""]
+        if not clean:
+            return {}
+        return {"traversal": {"elements": clean, "stats": {"truncated": len(clean) >= 2000}}}
+
+    @property
+    def interactables(self) -> list:
+        """In-viewport CLICKABLE_ROLES elements with text and a size, in traversal order.
+        Computed once from load_full_json() on first access.
+        """
+        if self._interactables is None:
+            elements = self.load_full_json().get("traversal", {}).get("elements", [])
+            # Most elements are off-screen: drop them with filter + itemgetter, which
+            # runs entirely in C, so the Python-level checks only see visible ones.
+            visible = filter(itemgetter("in_viewport"), elements)
+            # Classify each distinct role once instead of splitting every element's role
+            clickable: dict[str, bool] = {}
+            result = []
+            for e in visible:
+                role = e["role"]
+                is_clickable = clickable.get(role)
+                if is_clickable is None:
+                    is_clickable = clickable[role] = role.partition(" ")[0] in CLICKABLE_ROLES
+                if is_clickable and e.get("width") and e.get("height") and e["text"].strip():
+                    result.append(e)
+            self._interactables = result
+        return self._interactables
+
+    def viewport_indices(self):
+        """Yield indices of the in-viewport traversal elements, in order.
+        The in_viewport flags are kept as a bytearray column built once per result, so
+        off-screen runs are skipped by bytearray.find in C without touching their dicts.
+        """
+        if self._viewport_mask is None:
+            elements = self.load_full_json().get("traversal", {}).get("elements", [])
+            self._viewport_mask = bytearray(map(itemgetter("in_viewport"), elements))
+        mask = self._viewport_mask
+        i = mask.find(1)
+        while i >= 0:
+            yield i
+            i = mask.find(1, i + 1)
 
     def __repr__(self):
         return f"ToolResult(status={self.status}, pid={self.pid}, app={self.app}, summary={self.summary!r})"
@@ -252,13 +675,14 @@ class ToolResult:
 # Helpers
 # ---------------------------------------------------------------------------
 
-def ok(msg: str):   print(f"  ✅ {msg}", flush=True)
+# Output is flushed once per section header and on failures, not on every line.
+def ok(msg: str):   print(f"  ✅ {msg}")
 def fail(msg: str): print(f"  ❌ {msg}", flush=True)
-def info(msg: str): print(f"  ℹ️  {msg}", flush=True)
+def info(msg: str): print(f"  ℹ️  {msg}")
 
 def section(title: str):
-    print(f"\n{'='*60}", flush=True)
-    print(f"  {title}", flush=True)
+    print(f"\n{'='*60}")
+    print(f"  {title}")
     print(f"{'='*60}", flush=True)
 
 
@@ -269,19 +693,11 @@ def section(title: str):
 def test_tools_list(client: MCPClient) -> bool:
     section("Test: tools/list")
     tools = client.list_tools()
-    expected = {
-        "macos-use_open_application_and_traverse",
-        "macos-use_click_and_traverse",
-        "macos-use_type_and_traverse",
-        "macos-use_press_key_and_traverse",
-        "macos-use_scroll_and_traverse",
-        "macos-use_refresh_traversal",
-    }
     found = {t["name"] for t in tools}
-    missing = expected - found
-    extra = found - expected
+    missing = EXPECTED_TOOLS - found
+    extra = found - EXPECTED_TOOLS
     if not missing:
-        ok(f"All {len(expected)} expected tools present")
+        ok(f"All {len(EXPECTED_TOOLS)} expected tools present")
     else:
         fail(f"Missing tools: {missing}")
     if extra:
@@ -289,13 +705,15 @@ def test_tools_list(client: MCPClient) -> bool:
     return len(missing) == 0
 
 
-def test_open_app(client: MCPClient, app: str = "TextEdit") -> Optional[int]:
+def test_open_app(client: MCPClient, app: str = "TextEdit") -> tuple[Optional[int], ToolResult]:
+    """Returns the app's pid (None on failure) and the open result, whose traversal
+    callers may reuse while nothing has acted on the app since."""
     section(f"Test: open {app}")
     result = client.call_tool("macos-use_open_application_and_traverse", {"identifier": app})
 
     if result.status == "error":
         fail(f"Error: {result.error}")
-        return None
+        return None, result
 
     ok(f"Opened {result.app!r} (PID: {result.pid})")
     info(f"Summary: {result.summary}")
@@ -309,14 +727,15 @@ def test_open_app(client: MCPClient, app: str = "TextEdit") -> Optional[int]:
     else:
         fail("Could not load full JSON response file")
 
-    return result.pid
+    return result.pid, result
 
 
-def test_click(client: MCPClient, pid: int, search: Optional[str] = None) -> bool:
+def test_click(client: MCPClient, pid: int, search: Optional[str] = None,
+               initial: Optional[ToolResult] = None) -> bool:
     section(f"Test: click {'matching ' + repr(search) if search else 'first interactable'}")
 
-    # Get current state
-    result = client.call_tool("macos-use_refresh_traversal", {"pid": pid})
+    # Get current state — reuse `initial` (a traversal nothing has acted on since) if given
+    result = initial or client.call_tool("macos-use_refresh_traversal", {"pid": pid})
     data = result.load_full_json()
     elements = data.get("traversal", {}).get("elements", [])
 
@@ -327,23 +746,18 @@ def test_click(client: MCPClient, pid: int, search: Optional[str] = None) -> boo
     candidate = None
 
     if search:
-        needle = search.lower()
-        for e in elements:
-            text = (e.get("text") or "").lower()
-            if needle in text and e.get("in_viewport"):
-                candidate = e
+        # Case-insensitive search in C — no lowered copy of every element's text
+        needle = re.compile(re.escape(search), re.IGNORECASE)
+        # Only in-viewport elements are visited; the first whose text matches wins
+        for i in result.viewport_indices():
+            if needle.search(elements[i].get("text") or ""):
+                candidate = elements[i]
                 break
         if not candidate:
             fail(f"No in-viewport element matching {search!r}")
             return False
     else:
-        for e in elements:
-            role = e.get("role", "")
-            if (e.get("in_viewport") and e.get("text", "").strip()
-                    and e.get("width") and e.get("height")
-                    and ("Button" in role or "StaticText" in role)):
-                candidate = e
-                break
+        candidate = next(iter(result.interactables), None)
 
     if not candidate:
         fail("No suitable clickable element found")
@@ -491,16 +905,9 @@ def test_visible_elements(client: MCPClient, pid: int) -> bool:
         # It's possible (but unlikely) there are zero visible interactive elements
         info("No visible_elements section — may be OK if no interactive elements visible")
 
-    # 2. Diff case (click) — should have visible_elements from added elements
-    data = result.load_full_json()
-    elements = data.get("traversal", {}).get("elements", [])
-    candidate = None
-    for e in elements:
-        if (e.get("in_viewport") and e.get("text", "").strip()
-                and e.get("width") and e.get("height")
-                and ("Button" in e.get("role", "") or "StaticText" in e.get("role", ""))):
-            candidate = e
-            break
+    # 2. Diff case (click) — should have visible_elements from added elements.
+    # Same pick as test_click: the first interactable in traversal order.
+    candidate = next(iter(result.interactables), None)
 
     if candidate:
         click_result = client.call_tool("macos-use_click_and_traverse", {
@@ -539,8 +946,9 @@ def test_scroll(client: MCPClient, pid: int) -> bool:
 
     # Find a scrollable area
     target = None
-    for e in elements:
-        if e.get("in_viewport") and e.get("x") is not None and e.get("y") is not None:
+    for i in result.viewport_indices():
+        e = elements[i]
+        if e.get("x") is not None and e.get("y") is not None:
             target = e
             break
 
@@ -564,20 +972,54 @@ def test_scroll(client: MCPClient, pid: int) -> bool:
 # Main
 # ---------------------------------------------------------------------------
 
-def main():
+# Values for a bare `python3 scripts/test_mcp.py`; also the argparse defaults.
+DEFAULT_ARGS = {
+    "test": "all", "app": "TextEdit", "search": None, "timeout": 30.0,
+    "daemon": False, "reuse": False, "socket": SOCKET_PATH, "verbose": False,
+}
+
+
+def parse_args() -> Any:
+    # Returns a SimpleNamespace or an argparse.Namespace with the same attributes.
+    # The common invocation has no arguments: skip importing and building argparse.
+    if len(sys.argv) == 1:
+        return types.SimpleNamespace(**DEFAULT_ARGS)
+
+    import argparse
     parser = argparse.ArgumentParser(description="MCP server test client")
     parser.add_argument("--test", choices=[
         "all", "tools", "open", "click", "refresh", "type", "press", "scroll", "cap", "visible"
-    ], default="all")
-    parser.add_argument("--app", default="TextEdit",
-                        help="App to open for tests (default: TextEdit)")
-    parser.add_argument("--search", default=None,
+    ], default=DEFAULT_ARGS["test"])
+    parser.add_argument("--app", default=DEFAULT_ARGS["app"],
+                        help=f"App to open for tests (default: {DEFAULT_ARGS['app']})")
+    parser.add_argument("--search", default=DEFAULT_ARGS["search"],
                         help="Text to search for in click test")
-    parser.add_argument("--timeout", type=float, default=30.0,
+    parser.add_argument("--timeout", type=float, default=DEFAULT_ARGS["timeout"],
                         help="Seconds to wait for each server response")
-    args = parser.parse_args()
+    parser.add_argument("--daemon", action="store_true",
+                        help="Keep one server running and serve --reuse clients over a Unix socket")
+    parser.add_argument("--reuse", action="store_true",
+                        help="Connect to a running --daemon instead of spawning a server")
+    parser.add_argument("--socket", default=DEFAULT_ARGS["socket"],
+                        help=f"Unix socket path for --daemon/--reuse (default: {SOCKET_PATH})")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="Print each request/response sent to the server")
+    return parser.parse_args()
+
+
+def main():
+    global VERBOSE
+    args = parse_args()
+    VERBOSE = args.verbose
+
+    if args.daemon:
+        serve_daemon(SERVER_BIN, args.socket)
+        return
 
-    client = MCPClient(SERVER_BIN, timeout=args.timeout)
+    if args.reuse:
+        client = MCPSocketClient(args.socket, timeout=args.timeout)
+    else:
+        client = MCPClient(SERVER_BIN, timeout=args.timeout)
     results = []
 
     try:
@@ -593,47 +1035,34 @@ def main():
         if args.test in ("all", "cap"):
             results.append(("element_cap", test_element_cap(client)))
 
-        if args.test in ("all", "open"):
-            pid = test_open_app(client, args.app)
-            results.append(("open_app", pid is not None))
+        # Every remaining test needs the app: open it once up front
+        if args.test in ("all", "open", "refresh", "visible", "click", "scroll", "press", "type"):
+            pid, opened = test_open_app(client, args.app)
+            if args.test in ("all", "open"):
+                results.append(("open_app", pid is not None))
 
-        if args.test in ("all", "refresh"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
-            if pid:
-                results.append(("refresh", test_refresh(client, pid)))
+        if args.test in ("all", "refresh") and pid:
+            results.append(("refresh", test_refresh(client, pid)))
 
-        if args.test in ("all", "visible"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
-            if pid:
-                results.append(("visible_elements", test_visible_elements(client, pid)))
+        if args.test in ("all", "visible") and pid:
+            results.append(("visible_elements", test_visible_elements(client, pid)))
 
         if args.test in ("all", "click"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
             if pid:
-                results.append(("click", test_click(client, pid, search=args.search)))
+                # On its own, click runs straight after open, whose traversal is still current
+                initial = opened if args.test == "click" else None
+                results.append(("click", test_click(client, pid, search=args.search, initial=initial)))
             else:
                 fail("Skipping click test — no PID")
 
-        if args.test in ("all", "scroll"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
-            if pid:
-                results.append(("scroll", test_scroll(client, pid)))
+        if args.test in ("all", "scroll") and pid:
+            results.append(("scroll", test_scroll(client, pid)))
 
-        if args.test in ("all", "press"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
-            if pid:
-                results.append(("press_key", test_press_key(client, pid)))
+        if args.test in ("all", "press") and pid:
+            results.append(("press_key", test_press_key(client, pid)))
 
-        if args.test in ("all", "type"):
-            if pid is None:
-                pid = test_open_app(client, args.app)
-            if pid:
-                results.append(("type", test_type(client, pid)))
+        if args.test in ("all", "type") and pid:
+            results.append(("type", test_type(client, pid)))
 
         # Summary
         section("Summary")
@@ -641,13 +1070,12 @@ def main():
         total = len(results)
         for name, r in results:
             symbol = "✅" if r else "❌"
-            print(f"  {symbol} {name}", flush=True)
-        print(flush=True)
+            print(f"  {symbol} {name}")
+        print()
         symbol = "✅" if passed == total else "❌"
         print(f"  {symbol} {passed}/{total} tests passed", flush=True)
 
         if passed < total:
-            print("\n[server stderr (last 30 lines)]:")
             client.dump_stderr()
             sys.exit(1)
 